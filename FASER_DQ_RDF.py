@@ -12,10 +12,13 @@ Adapted to work with the new p0011/p0012 2024 data
 """
 
 import os
+import re
 import glob
 import json
-import shutil
 import argparse
+import contextlib
+import functools
+from collections import defaultdict
 from pathlib import Path
 import logging
 from typing import List, Dict, Union
@@ -24,199 +27,280 @@ import ROOT
 import yaml
 import uproot
 import numpy as np
-from tqdm import tqdm
+from tqdm.contrib.concurrent import thread_map
 
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml C bindings - much faster than the pure python loader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
+try:
+    import orjson  # faster json parser - nice to have but not worth a hard dependency
+except ImportError:
+    orjson = None
 
-def get_run_number_lumi_dict(path_to_grls: str) -> Dict[int, float]:
+
+
+def _load_grl(path_to_grls: str) -> tuple:
     """
-    Parse the .csv files in the Good Run List (GRL) directory to map the run number to the recorded luminosity
+    Parse the Good Run List (GRL) directory exactly once and cache the result
+    The GRL `.json` files give the stable/excluded time periods per run and the `.csv` files give the recorded luminosity
+    The cut/lumi helpers below are thin wrappers around this function, so repeated calls don't re-glob and re-parse the same files
+    The cache key includes the file mtimes, so an updated GRL (e.g. a new cvmfs release appearing mid-session) re-parses
+    instead of serving stale periods
+
     args:
-        `path_to_grls`: `str` - path to directory containing the .json GRL files
-    
+        `path_to_grls`: `str` - path to directory containing the GRL files
+
     returns:
-        `run_lumi_dict`: `Dict` - Dictionary which maps run number to luminosity (in /fb) 
+        `(good_times, excluded_times, run_lumi_dict)`: `tuple` - dicts mapping run number to stable periods,
+        excluded periods and recorded luminosity (in /fb) respectively
+
+    raises:
+        `OSError` if no `.json` or `.csv` files are found in `path_to_grls` directory
     """
 
+    mtime_key = tuple(sorted(
+        (fpath, os.path.getmtime(fpath))
+        for pattern in ("*.json", "*.csv")
+        for fpath in glob.iglob(f"{path_to_grls}/{pattern}")
+    ))
+
+    return _parse_grl(path_to_grls, mtime_key)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_grl(path_to_grls: str, mtime_key: tuple) -> tuple:
+    """
+    The actual (cached) GRL parse - call through `_load_grl`, which builds the mtime cache key
+    """
+
+    grl_jsons = glob.glob(f"{path_to_grls}/*.json")
+
+    if len(grl_jsons) == 0:
+        print(f"Error: No GRLS .json found on path {path_to_grls}!")
+        raise OSError("No files found")
+
+    good_times = {}
+    excluded_times = {}
+
+    for grl_file in grl_jsons:
+        with open(grl_file, 'rb') as f:
+            grl_dict = orjson.loads(f.read()) if orjson is not None else json.load(f)
+
+            for run_number, run_info in grl_dict.items():
+
+                good_times[run_number] = run_info['stable_list']
+
+                if "excluded_list" not in run_info.keys(): continue
+
+                excluded_times[run_number] = run_info['excluded_list']
+                # logging.info(f"Found {len(run_info['excluded_list'])} excluded periods for run {run_number}")
+
     grl_csvs = glob.glob(f"{path_to_grls}/*.csv")
 
     if len(grl_csvs) == 0:
         print(f"Error: No GRLS .csv found on path {path_to_grls}!")
-        raise OSError("No files found")    
+        raise OSError("No files found")
 
     run_lumi_dict = {}
 
     for fpath in grl_csvs:
-        with open(fpath, 'r') as f:
-            for i, line in enumerate(f):
-                if i == 0: continue
-                if line.startswith('#'): continue
+        #* Parse the run number and recorded lumi columns in one numpy pass rather than a python line loop
+        arr = np.atleast_2d(np.genfromtxt(fpath, delimiter=',', usecols=(0, 3), comments='#', skip_header=1))
+        if arr.size == 0: continue
 
-                spline = line.split(',')
-                run_number = int(spline[0])
-                lumi_rec = float(spline[3])
+        run_lumi_dict.update(zip(arr[:, 0].astype(int).tolist(), (arr[:, 1] / 1000).tolist())) # pb^-1 -> fb^-1
 
-                run_lumi_dict[run_number] = lumi_rec / 1000 # pb^-1 -> fb^-1
-    
-    return run_lumi_dict
+    return good_times, excluded_times, run_lumi_dict
 
 
-def make_excluded_times_cut(path_to_grls: str) -> str:
+def get_run_time_range(path_to_grls: str, run_number: int) -> Union[tuple, None]:
     """
-    Function to parse the .json files in the Good Run List (GRL) directory to find excluded time periods in otherwise good runs
-    Function parses these time periods to construct a cut string which can be applied as a filter in a ROOT.RDataFrame to 
-    remove the bad time periods
+    Get the (start, stop) utime of a run's stable periods from the cached GRL
+    Lets us bin the eventTime histogram without a pass over the data - after the good-times
+    filter every surviving event lies inside the stable periods anyway
 
     args:
-        `path_to_grls`: `str` - path to directory containing the .json GRL files
-    
+        `path_to_grls`: `str` - path to directory containing the GRL files
+        `run_number`: `int` - the run to look up
+
     returns:
-        `cut_str`: `str` - a string which can be used with ROOT.RDataFrame::Filter to filter out excluded time periods from runs
+        `(start, stop)`: `tuple` - earliest stable start and latest stable stop utime, or `None` if the run isn't in the GRL
+    """
 
-    raises:
-        `OSError` if no `.json` file are found in `path_to_grls` directory
+    good_times, _, _ = _load_grl(path_to_grls)
+
+    stable_list = good_times.get(str(run_number), good_times.get(run_number))
+    if not stable_list: return None
+
+    return (min(period['start_utime'] for period in stable_list),
+            max(period['stop_utime'] for period in stable_list))
+
+
+def get_run_number_lumi_dict(path_to_grls: str) -> Dict[int, float]:
     """
+    Parse the .csv files in the Good Run List (GRL) directory to map the run number to the recorded luminosity
+    args:
+        `path_to_grls`: `str` - path to directory containing the .json GRL files
 
-    grl_jsons = glob.glob(f"{path_to_grls}/*.json")
+    returns:
+        `run_lumi_dict`: `Dict` - Dictionary which maps run number to luminosity (in /fb)
+    """
 
-    if len(grl_jsons) == 0:
-        print(f"Error: No GRLS .json found on path {path_to_grls}!")
-        raise OSError("No files found")
+    _, _, run_lumi_dict = _load_grl(path_to_grls)
 
-    excluded_times = {}
+    return run_lumi_dict
 
-    n_excluded_times = 0
-    for grl_file in grl_jsons:    
-        with open(grl_file, 'r') as f:
-            grl_dict = json.load(f)
-            
-            for run_number, run_info in grl_dict.items():
 
-                if "excluded_list" not in run_info.keys(): continue
+def make_grl_time_tables(path_to_grls: str) -> tuple:
+    """
+    Function to turn the stable/excluded time periods from the Good Run List (GRL) .json files into per-run
+    interval tables, sorted by start time. These are the tables which back the C++ `InGoodTimes`/`InExcludedTimes`
+    lookup functions in `RDFDefines.h`
 
-                excluded_times[run_number] = run_info['excluded_list']
-                n_excluded_times += len(run_info['excluded_list'])
-                # logging.info(f"Found {len(run_info['excluded_list'])} excluded periods for run {run_number}")
+    args:
+        `path_to_grls`: `str` - path to directory containing the .json GRL files
 
-    if n_excluded_times == 0: return ""
+    returns:
+        `(good_table, excluded_table)`: `tuple` - dicts mapping run number to a sorted list of (start_utime, stop_utime) pairs
+    """
 
-    logging.info(f"Applying cuts to remove {n_excluded_times} excluded periods")
+    good_times, excluded_times, _ = _load_grl(path_to_grls)
 
-    cut_str = ""
-    for run_number, exclusion_list in excluded_times.items():
-        for i, exclusion_info in enumerate(exclusion_list):
-            start_time = exclusion_info['start_utime']
-            stop_time = exclusion_info['stop_utime']
+    def merge_periods(periods):
+        #* Merge overlapping/touching periods - GRLs often list one stable period per lumi block,
+        #* so runs that were stable throughout collapse to a single interval and the per-event
+        #* binary search becomes trivial
+        merged = []
+        for start, stop in periods:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        return [tuple(period) for period in merged]
 
-            cut_str += f"((eventTime >= {start_time}) && (eventTime <= {stop_time}) && (run == {run_number}))"
-            if n_excluded_times > 1:
-                cut_str += " || "
-            
-    return cut_str.rstrip(" || ")
+    def to_table(times_dict):
+        table = {}
+        for run_number, period_list in times_dict.items():
+            table[int(run_number)] = merge_periods(sorted((period['start_utime'], period['stop_utime']) for period in period_list))
+        return table
 
+    return to_table(good_times), to_table(excluded_times)
 
-def make_good_times_cut(path_to_grls: str) -> str:
+
+def declare_grl_time_filters(path_to_grls: str, run_number: int=None) -> bool:
     """
-    Function to parse the .json files in the Good Run List (GRL) directory to find the stable time periods in good runs
-    Function parses these time periods to construct a cut string which can be applied as a filter in a ROOT.RDataFrame to 
-    select for the stable periods.
+    Function to fill the C++ interval tables used by the `InGoodTimes`/`InExcludedTimes` filter functions
+    Rather than JIT compiling a giant `(eventTime >= a && eventTime <= b && run == r) || ...` expression
+    (one clause per period, all evaluated per event), the periods live in a sorted per-run table which
+    is binary searched per event
 
     args:
         `path_to_grls`: `str` - path to directory containing the .json GRL files
-    
-    returns:
-        `cut_str`: `str` - a string which can be used with ROOT.RDataFrame::Filter to filter out select for time periods from runs
+        `run_number`: `int`(optional) - if given, only this run's periods are loaded. We filter to
+        a single run per job anyway, so the other runs' tables would just take up space
 
-    raises:
-        `OSError` if no `.json` file are found in `path_to_grls` directory
+    returns:
+        `has_excluded_times`: `bool` - True if any excluded periods were found (i.e. the excluded-times filter is needed)
     """
 
-    grl_jsons = glob.glob(f"{path_to_grls}/*.json")
+    declare_cpp_helpers()  # the interval tables live in RDFDefines.h
 
-    if len(grl_jsons) == 0:
-        print(f"Error: No GRLS .json found on path {path_to_grls}!")
-        raise OSError("No files found")
+    good_table, excluded_table = make_grl_time_tables(path_to_grls)
 
-    good_times = {}
+    if run_number is not None:
+        good_table = {run: intervals for run, intervals in good_table.items() if run == run_number}
+        excluded_table = {run: intervals for run, intervals in excluded_table.items() if run == run_number}
 
-    n_good_times = 0
-    for grl_file in grl_jsons:   
-        with open(grl_file, 'r') as f:
-            grl_dict = json.load(f)
-            
-            for run_number, run_info in grl_dict.items():
+    n_excluded_times = sum(len(intervals) for intervals in excluded_table.values())
+    if n_excluded_times > 0:
+        logging.info(f"Applying cuts to remove {n_excluded_times} excluded periods")
 
-                good_times[run_number] = run_info['stable_list']
-                n_good_times += len(run_info['stable_list'])
+    #* Clear first so a second call replaces the tables rather than appending duplicate (and
+    #* no-longer-sorted) intervals, which would break the binary search in InTimePeriods
+    fill_lines = ["gGoodTimes.clear();", "gExcludedTimes.clear();"]
+    for table_name, table in (("gGoodTimes", good_table), ("gExcludedTimes", excluded_table)):
+        for run_number, intervals in table.items():
+            for start_time, stop_time in intervals:
+                fill_lines.append(f"{table_name}[{run_number}].emplace_back({start_time}ULL, {stop_time}ULL);")
 
-    cut_str = ""
-    for run_number, stable_list in good_times.items():
-        
-        for i, stable_info in enumerate(stable_list):
-            start_time = stable_info['start_utime']
-            stop_time = stable_info['stop_utime']
+    ROOT.gInterpreter.ProcessLine("{ " + " ".join(fill_lines) + " }")
 
-            cut_str += f"((eventTime >= {start_time}) && (eventTime <= {stop_time}) && (run == {run_number}))"
+    return n_excluded_times > 0
 
-            if n_good_times > 1:
-                cut_str += " || "
-            
-    return cut_str.rstrip(" || ")
 
 
+def _probe_file(fpath: str) -> bool:
+    """
+    Check that a single NTuple file can be opened and that it contains the `nt` tree
+
+    args:
+        `fpath`: `str` - path to the file to check
+
+    returns:
+        `ok`: `bool` - True if the file is openable and contains the `nt` tree
+    """
+
+    try:
+        #* Skip the streamer/branch metadata and caches we'll never use - for xRootD files this
+        #* cuts the probe down to a couple of network round-trips
+        data = uproot.open(fpath, timeout=30, minimal_ttree_metadata=True, object_cache=None, array_cache=None)
+    except Exception as e:
+        print(f"Error: Unable to open {fpath}")
+        return False
+
+    #* Exact key lookup rather than scanning every key for an 'nt' substring
+    if 'nt' not in data:
+        print(f"Error: Unable to open {fpath}. Does not contain 'nt' tree. Available keys are {data.keys()}")
+        return False
+
+    return True
+
 
 def validate_file_list(file_list) -> List[str]:
     """
-    File check while loops through input files and checks that they can be opened and that they contain the `nt` tree
+    File check which checks that the input files can be opened and that they contain the `nt` tree
+    Files are opened concurrently since opening remote (xRootD/EOS) files is latency-bound and
+    uproot releases the GIL during I/O
 
-    args: 
+    args:
         `file_list`: `List[str]` - list of files to check
-    
+
     returns:
         `good_files`: `List[str]` - list of files which are openable and contain the `nt` tree
     """
 
-    bad_files = []
-    for fpath in tqdm(file_list):
-        try:
-            data = uproot.open(fpath)
-        except Exception as e:
-            print(f"Error: Unable to open {fpath}")
-            bad_files.append(fpath)
-            continue
-        
-        key_found = False
-        for key in data.keys():
-            if 'nt' in key: 
-                key_found = True
-                break
-        
-        if not key_found:
-            bad_files.append(fpath)
-            print(f"Error: Unable to open {fpath}. Does not contain 'nt' tree. Available keys are {data.keys()}")
-    
-    good_files = [fpath for fpath in file_list if fpath not in bad_files]
+    #* thread_map handles both the pool and the progress bar; chunking keeps the bar from
+    #* becoming the serialising bottleneck once the opens run concurrently
+    results = thread_map(_probe_file, file_list, max_workers=32, chunksize=16, miniters=100, mininterval=0.5)
+
+    good_files = [fpath for fpath, ok in zip(file_list, results) if ok]
 
     return good_files
 
 
 
-def check_df_and_apply_alias(df: ROOT.RDataFrame, column_name: str, column_alias: str) -> ROOT.RDataFrame:
+def check_df_and_apply_alias(df: ROOT.RDataFrame, column_name: str, column_alias: str, existing_columns: set) -> ROOT.RDataFrame:
     """
-    Function that checks whether `column_name` exists in an RDataFrame and if it does not, create `column` name 
+    Function that checks whether `column_name` exists in an RDataFrame and if it does not, create `column` name
     by aliasing it to `column_alias`
 
     args:
         `df`: `ROOT.RDataframe` - dataframe to apply aliases to
         `column_name`: `str` - the column name to create via alias if not present in df
         `column_alias`: `str` - the column that will be aliased to `column_name`
+        `existing_columns`: `set` - the column names already present in `df`. Computed once by the caller
+        since `df.GetColumnNames()` re-materialises the full column list on every call. Updated in place
+        when an alias is applied
 
     returns:
         `df`: `ROOT.RDataFrame` - dataframe with the aliases applied (if required)
     """
 
-    if column_name not in df.GetColumnNames():
+    if column_name not in existing_columns:
         df = df.Alias(column_name, column_alias)
+        existing_columns.add(column_name)
         logging.info(f"Aliasing {column_name} -> {column_alias}")
 
     return df
@@ -285,34 +369,37 @@ def alias_data(df: ROOT.RDataFrame, has_veto11) -> ROOT.RDataFrame:
     "localtime",
     "bcidtime"]
 
+    #* Grab the column names once - GetColumnNames re-materialises the full list on every call
+    existing_columns = set(str(c) for c in df.GetColumnNames())
+
     for old_prefix, new_prefix in veto_prefix_map.items():
         for varname in veto_variables:
-            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname)  
+            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname, existing_columns)
 
     for old_prefix, new_prefix in caloLo_prefix_map.items():
         for varname in calo_variables:
-            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname)  
+            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname, existing_columns)
 
     for old_prefix, new_prefix in caloHi_prefix_map.items():
         for varname in calo_variables:
-            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname)  
+            df = check_df_and_apply_alias(df, old_prefix+varname, new_prefix+varname, existing_columns)
 
     #* Alias total calo variables
-    df = check_df_and_apply_alias(df, "CaloHi_total_E_EM",  "Calo_total_E_EM")
-    df = check_df_and_apply_alias(df, "CaloLo_total_E_EM",  "Calo_total_E_EM")
-    df = check_df_and_apply_alias(df, "CaloHi_total_nMIP",  "Calo_total_nMIP")
-    df = check_df_and_apply_alias(df, "CaloLo_total_nMIP",  "Calo_total_nMIP")
-    df = check_df_and_apply_alias(df, "CaloHi_total_E_dep",  "Calo_total_E_dep")
-    df = check_df_and_apply_alias(df, "CaloLo_total_E_dep",  "Calo_total_E_dep")
-    df = check_df_and_apply_alias(df, "CaloHi_total_fit_E_EM",  "Calo_total_fit_E_EM")
-    df = check_df_and_apply_alias(df, "CaloLo_total_fit_E_EM",  "Calo_total_fit_E_EM")
-    df = check_df_and_apply_alias(df, "CaloHi_total_raw_E_EM",  "Calo_total_raw_E_EM")
-    df = check_df_and_apply_alias(df, "CaloLo_total_raw_E_EM",  "Calo_total_raw_E_EM")
+    df = check_df_and_apply_alias(df, "CaloHi_total_E_EM",  "Calo_total_E_EM", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloLo_total_E_EM",  "Calo_total_E_EM", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloHi_total_nMIP",  "Calo_total_nMIP", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloLo_total_nMIP",  "Calo_total_nMIP", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloHi_total_E_dep",  "Calo_total_E_dep", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloLo_total_E_dep",  "Calo_total_E_dep", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloHi_total_fit_E_EM",  "Calo_total_fit_E_EM", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloLo_total_fit_E_EM",  "Calo_total_fit_E_EM", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloHi_total_raw_E_EM",  "Calo_total_raw_E_EM", existing_columns)
+    df = check_df_and_apply_alias(df, "CaloLo_total_raw_E_EM",  "Calo_total_raw_E_EM", existing_columns)
 
     return df
 
 
-def book_per_run_hists(df: ROOT.RDataFrame, histogram_cfg: Dict, run_number: int=None) -> List:
+def book_per_run_hists(df: ROOT.RDataFrame, histogram_cfg: Dict, run_number: int=None, time_range: tuple=None) -> List:
     """
     Function to book histograms which need to be evaluated for each run seperately
     
@@ -334,10 +421,14 @@ def book_per_run_hists(df: ROOT.RDataFrame, histogram_cfg: Dict, run_number: int
         }
         ```
 
-        `run_number`: `int`(optional) - the run number to select for if given. We usually just run 
+        `run_number`: `int`(optional) - the run number to select for if given. We usually just run
         over one run per job so we don't need to set this. Option is there just in case your files
         contain multiple runs.
 
+        `time_range`: `tuple`(optional) - (start, stop) utime used to bin the eventTime histogram
+        (usually from `get_run_time_range`). If not given, the range is computed from the data,
+        which costs an extra pass over the events.
+
     returns:
        `per_run_histos`: `List` - List of histograms to be filled
     """
@@ -347,45 +438,71 @@ def book_per_run_hists(df: ROOT.RDataFrame, histogram_cfg: Dict, run_number: int
     else:
         df_this_run = df
 
-    #TODO: Dunno if we want to make the weight configurable. I define a column in case we want to in the future
-    df_this_run = df_this_run.Define("weight", f"1")
-
+    #* NB: no per-event weight column - the fills are unweighted and any run-constant weight
+    #* can be applied with h.Scale() after the event loop, which is free by comparison
     per_run_histos = []
 
-    available_columns = df.GetColumnNames()
+    #* Snapshot the column names into a python set once - membership tests against the C++
+    #* vector are a linear scan with a string conversion per element
+    available_columns = set(str(column) for column in df.GetColumnNames())
+
+    #* Histograms with identical cut expressions share a single Filter node so the cut is only
+    #* evaluated (and jitted) once per event rather than once per histogram
+    filtered_dfs = {}
+
+    #* Guard against two configs booking the same histogram name - the second would silently
+    #* double the fill cost and clobber the first in the output file
+    booked_names = set()
 
     for conf in histogram_cfg.values():
-        
+
         if conf['name'] not in available_columns:
                 logging.error(f"Could not find {conf['name']} in dataframe. Check your histogram configs and definitions.")
                 raise ValueError("Invalid histogram config")
 
+        if conf['name'] in booked_names:
+            logging.warning(f"Histogram {conf['name']} is booked more than once. Skipping the duplicate - check your configs.")
+            continue
+        booked_names.add(conf['name'])
+
         #* Set a new histogram for making this histogram
         df_this_hist = df_this_run
-        
-        #* Rescale column to get in new units if asked
-        column_name = conf['name']
-        unit_scale = conf.get('unit_scale', False)
-        if unit_scale:
-            new_column_name = f"{column_name}_times_{unit_scale}".replace('.', '_') # NB: cannot have '.' in column name
-            df_this_hist = df_this_hist.Define(new_column_name, f"{column_name} * {unit_scale}")
-            column_name = new_column_name
 
         #* Make a new dataframe with a cut applied if required, just for this histogram
-        if conf.get('cut', False): 
+        if conf.get('cut', False):
             cut_expr = conf['cut'].get('expression', False)
             cut_name = conf['cut'].get('name', "")
             if not cut_expr:
                 logging.warning(f"You tried to apply a cut for histogram {conf['name']} but no cut expression was given! No cut will be applied here.")
             else:
-                df_this_hist = df_this_hist.Filter(cut_expr, cut_name)
-        
+                if cut_expr not in filtered_dfs:
+                    filtered_dfs[cut_expr] = df_this_run.Filter(cut_expr, cut_name)
+                df_this_hist = filtered_dfs[cut_expr]
+
+        #* Rescale column to get in new units if asked. Done after the cut so the shared Filter
+        #* node above stays common to all histograms with the same cut expression
+        column_name = conf['name']
+        unit_scale = conf.get('unit_scale', False)
+        if unit_scale:
+            new_column_name = f"{column_name}_times_{unit_scale}".replace('.', '_') # NB: cannot have '.' in column name
+            df_this_hist = df_this_hist.Define(new_column_name, f"{column_name} * {unit_scale}")
+            column_name = new_column_name
+
         #* Now we book the histogram
-        per_run_histos.append(df_this_hist.Histo1D((conf['name'], f"{conf['name']};{conf['name']};Events", conf['nbins'], conf['min'], conf['max']), column_name, "weight"))
+        #* Pass a pre-built TH1DModel rather than a python tuple so PyROOT doesn't have to
+        #* deduce and convert the model on every booking
+        model = ROOT.RDF.TH1DModel(conf['name'], f"{conf['name']};{conf['name']};Events", conf['nbins'], conf['min'], conf['max'])
+        per_run_histos.append(df_this_hist.Histo1D(model, column_name))
     
     #* Now finally book the eventTime histogram. This is kinda awkward to define with a simple yaml due the upper/lower bin edges
-    event_times = np.array(df_this_run.AsNumpy(["eventTime"])["eventTime"])
-    per_run_histos.append(df_this_run.Histo1D(("eventTime", "eventTime;eventTime;Events", 100, np.amin(event_times)-1, np.amax(event_times)+1), f"eventTime", "weight"))
+    if time_range is None:
+        #* No GRL range available - fall back to computing it from the data. Book both reductions
+        #* before triggering either so the extra pass over the events only happens once
+        t_min = df_this_run.Min("eventTime")
+        t_max = df_this_run.Max("eventTime")
+        time_range = (t_min.GetValue(), t_max.GetValue())
+
+    per_run_histos.append(df_this_run.Histo1D(ROOT.RDF.TH1DModel("eventTime", "eventTime;eventTime;Events", 100, time_range[0]-1, time_range[1]+1), f"eventTime"))
 
     return per_run_histos
 
@@ -403,152 +520,307 @@ def book_yield_hists(df: ROOT.RDataFrame, run_number: int) -> List:
     """
 
     yield_hists = []
-    runs = [run_number]
 
-    nruns = int(max(runs) - min(runs) + 1)
-    rmin =  min(runs)
-    rmax =  max(runs) + 1
-    
-    # Track yields
-    yield_hists.append(df.Histo1D(("Yield", "Yield;Yield;Events", nruns, rmin, rmax), "run"))
-    yield_hists.append(df.Histo1D(("TrkYield", "TrkYield;TrkYield;Events", nruns, rmin, rmax), "run", "NTracks"))
-    yield_hists.append(df.Histo1D(("PosTrkYield", "PosTrkYield;PosTrkYield;Events", nruns, rmin, rmax), "run", "NPosTracks"))
-    yield_hists.append(df.Histo1D(("NegTrkYield", "NegTrkYield;NegTrkYield;Events", nruns, rmin, rmax), "run", "NNegTracks"))
-    
-    yield_hists.append(df.Histo1D(("GoodTrkYield", "GoodTrkYield;GoodTrkYield;Events", nruns, rmin, rmax), "run", "NGoodTracks"))
-    yield_hists.append(df.Histo1D(("GoodPosTrkYield", "GoodPosTrkYield;GoodPosTrkYield;Events", nruns, rmin, rmax), "run", "NGoodPosTracks"))
-    yield_hists.append(df.Histo1D(("GoodNegTrkYield", "GoodNegTrkYield;GoodNegTrkYield;Events", nruns, rmin, rmax), "run", "NGoodNegTracks"))
+    #* One run per job, so the yield histograms are a single bin covering [run_number, run_number + 1)
+    nruns = 1
+    rmin = run_number
+    rmax = run_number + 1
+
+
+    def model(name):
+        return ROOT.RDF.TH1DModel(name, f"{name};{name};Events", nruns, rmin, rmax)
 
-    # Calorimeter yields
-    yield_hists.append(df.Histo1D(("CaloHiYield", "CaloHiYield;CaloHiYield;Events", nruns, rmin, rmax), "run", "CaloHiYield"))
-    yield_hists.append(df.Histo1D(("CaloLoYield", "CaloLoYield;CaloLoYield;Events", nruns, rmin, rmax), "run", "CaloLoYield"))
+    # Track yields
+    yield_hists.append(df.Histo1D(model("Yield"), "run"))
+    yield_hists.append(df.Histo1D(model("TrkYield"), "run", "NTracks"))
+    yield_hists.append(df.Histo1D(model("PosTrkYield"), "run", "NPosTracks"))
+    yield_hists.append(df.Histo1D(model("NegTrkYield"), "run", "NNegTracks"))
 
+    yield_hists.append(df.Histo1D(model("GoodTrkYield"), "run", "NGoodTracks"))
+    yield_hists.append(df.Histo1D(model("GoodPosTrkYield"), "run", "NGoodPosTracks"))
+    yield_hists.append(df.Histo1D(model("GoodNegTrkYield"), "run", "NGoodNegTracks"))
 
     return yield_hists
 
 
-def build_dataframe(file_list: List[str], tree: str='nt') -> ROOT.RDataFrame:
+def make_calo_yield_hists(calo_counts: Dict, run_number: int) -> List:
+    """
+    Make the calorimeter yield histograms from the lazy event counts booked in `build_dataframe`
+    Reading the count values triggers the event loop if it hasn't already run, so call this after
+    the other histograms have been filled
+    args:
+        `calo_counts`: `Dict` - maps histogram name to the lazy RDF event count for that yield
+        `run_number`: `int` -  The run number - required to get the bin edges right
+    returns:
+        `calo_hists`: `List` - List of filled histograms
+    """
+
+    calo_hists = []
+    for name, count in calo_counts.items():
+        h = ROOT.TH1D(name, f"{name};{name};Events", 1, run_number, run_number + 1)
+        h.SetBinContent(1, count.GetValue())
+        calo_hists.append(h)
+
+    return calo_hists
+
+
+#* Intermediate struct-valued columns produced by the single-pass C++ kernels in RDFDefines.h
+#* These only exist to be sliced into the real columns and are excluded from snapshots
+_STRUCT_COLUMNS = {"trkKin", "trkSplit"}
+
+_cpp_helpers_declared = False
+
+def declare_cpp_helpers() -> None:
+    """
+    Declare the C++ helpers used by the string-based Defines/Filters
+    Guarded by a module flag so the cling JIT compilation only ever happens once per process,
+    no matter how many times this gets called
+    """
+
+    global _cpp_helpers_declared
+    if _cpp_helpers_declared: return
+
+    #* Allow shorter use of vecops functions in strings
+    # e.g. DeltaPhi rather than ROOT::VecOps::DeltaPhi
+    ROOT.gInterpreter.Declare("using namespace ROOT::VecOps;")
+
+    #* Prefer compiling the helpers ahead-of-time with ACLiC. The shared library is cached next to
+    #* the header and only rebuilt when it changes, so jobs skip the cling JIT of RDFDefines.h and
+    #* the helpers get compiled with optimisations on. Fall back to the plain JIT declare if the
+    #* compile fails (e.g. when running from a read-only directory)
+    if ROOT.gSystem.CompileMacro("RDFDefines.h", "kO") != 1:
+        logging.warning("Could not compile RDFDefines.h with ACLiC - falling back to the cling JIT")
+        ROOT.gInterpreter.Declare('#include "RDFDefines.h"')
+
+    _cpp_helpers_declared = True
+
+
+def sort_files_by_size(file_list: List[str]) -> List[str]:
+    """
+    Sort local input files largest-first so that the implicit multithreading work queue schedules the
+    big files before the stragglers (longest-processing-time-first balances heterogeneous file sizes)
+    Remote (e.g. root://) paths are left in their original order since we can't cheaply stat them
+
+    args:
+        `file_list`: `List[str]` - list of input files
+
+    returns:
+        `file_list`: `List[str]` - the sorted list of files
+    """
+
+    if any("://" in fpath for fpath in file_list):
+        return file_list
+
+    return sorted(file_list, key=os.path.getsize, reverse=True)
+
+
+def enable_remote_read_ahead(file_list: List[str]) -> None:
+    """
+    Turn on ROOT's async prefetching and TTreeCache learning when reading remote (xRootD/EOS) files
+    so that basket fetches are batched into read-ahead requests instead of paying one network
+    round-trip each. Does nothing for purely local file lists
+
+    args:
+        `file_list`: `List[str]` - list of input files
+    """
+
+    if not any(fpath.startswith(("root://", "http://", "https://")) for fpath in file_list):
+        return
+
+    ROOT.gEnv.SetValue("TFile.AsyncPrefetching", 1)
+    ROOT.TTreeCache.SetLearnEntries(100)
+    logging.info("Enabled async prefetching for remote input files")
+
+
+def build_dataframe(file_list: List[str], run_number: int, grl_path: str, tree: str='nt', snapshot_cache: str=None) -> tuple:
     """
     Function which constructs a ROOT RDataFrame from file(s) in `file_list`
     Applys the neccessary column definitions, aliases and data quality cuts
+    This is only called once per job (we run one run per job) so all the JIT/parse work here happens exactly once
 
     args:
         `file_list`: `List[str]` - list of files to load
+        `run_number`: `int` - the run being processed (used to work out which aliases are needed)
+        `grl_path`: `str` - path to directory containing the GRL files
         `tree`: `str` - the name of the tree in the NTuples to read (default='nt')
+        `snapshot_cache`: `str`(optional) - path to a local snapshot of the pre-selected events.
+        If the file exists we read from it and skip the aliasing/filtering entirely; if it doesn't
+        we write it after applying the cuts, so re-runs (e.g. when tweaking histogram configs)
+        only have to read the small slimmed file instead of the full NTuples
 
     returns:
         `df`: `ROOT.RDataFrame` - the filtered dataframe with columns defined
+        `calo_counts`: `Dict` - lazy Count handles for the calo yield cuts, keyed by histogram
+        name (run through RunGraphs alongside the histograms, see make_calo_yield_hists)
     """
 
-    df = ROOT.RDataFrame(tree, file_list)
+    #* The GRL cuts are very selective, so a snapshot of the surviving events is small and re-reading
+    #* it is far cheaper than another pass over the source NTuples. The snapshot materialises the
+    #* aliased/defined columns, so none of the pipeline below needs re-applying
+    if snapshot_cache is not None and os.path.exists(snapshot_cache):
+        logging.info(f"Reading pre-selected events from snapshot cache {snapshot_cache}")
+        declare_cpp_helpers()  # main still needs WriteAll & co. even when the pipeline below is skipped
+        df = ROOT.RDataFrame("nt_slim", snapshot_cache)
+        return df, _book_calo_counts(df)
+
+    enable_remote_read_ahead(file_list)
+
+    df = ROOT.RDataFrame(tree, sort_files_by_size(file_list))
     # ROOT.RDF.Experimental.AddProgressBar(df)
 
     #* Check if run is from 2022/23 - we didn't have Veto Station 11 for these years
     has_veto11 = True
-    if args.run < 1.2e4: 
-        has_veto11 = False 
+    if run_number < 1.2e4:
+        has_veto11 = False
 
     #* Apply aliases to map old variable names to their new ones
     df = alias_data(df, has_veto11)
 
-    #* Allow shorter use of vecops functions in strings
-    # e.g. DeltaPhi rather than ROOT::VecOps::DeltaPhi 
-    ROOT.gInterpreter.Declare("using namespace ROOT::VecOps;")
+    #* Make sure the C++ helpers in RDFDefines.h are available to the Defines/Filters below
+    declare_cpp_helpers()
 
-    #* C++ defines (must not rely on anything defined below)
-    ROOT.gInterpreter.Declare('#include "RDFDefines.h"')
+    #* Select the job's run first - a single int compare that cuts any stray events from other
+    #* runs before the more expensive cuts, and means the downstream run filter in the histogram
+    #* booking has nothing left to do
+    df = df.Filter(f"run == {run_number}", f"Run {run_number}")
 
-    #* Data quality cuts
-    good_times_cut_str = make_good_times_cut(args.grl_path)           # Select for the periods of stable running
-    df = df.Define("GoodTimes", good_times_cut_str)
-    df = df.Filter("GoodTimes", "Good times")
-    
-    exlcuded_times_cut_str = make_excluded_times_cut(args.grl_path)   # Some runs have certain time periods excluded. These periods are recorded in the GRL json files.
-    if exlcuded_times_cut_str != "":
-        df = df.Define("ExcludedTimes", exlcuded_times_cut_str)
-        df = df.Filter("!ExcludedTimes", "Excluded times")
+    #* Data quality cuts (interval tables restricted to this run)
+    has_excluded_times = declare_grl_time_filters(grl_path, run_number)
+    df = df.Filter("InGoodTimes(run, eventTime)", "Good times")       # Select for the periods of stable running
+
+    if has_excluded_times:                                            # Some runs have certain time periods excluded. These periods are recorded in the GRL json files.
+        df = df.Filter("!InExcludedTimes(run, eventTime)", "Excluded times")
     
-    df = df.Filter("(Timing0_status & 4) == 0 && (Timing1_status & 4) == 0 && (Timing2_status & 4) == 0 && (Timing3_status & 4) == 0 ", "No timing saturation")
-    df = df.Filter("distanceToCollidingBCID == 0", "Colliding")
-    df = df.Filter("(TAP & 4) != 0", "Timing Trigger")
+    #* One Filter node for the simple per-event cuts - the timing-trigger bit test goes first since
+    #* it is both the cheapest and the most selective, so most events short-circuit after one branch.
+    #* OR-ing the four status words means one saturation-bit test instead of four. The GRL filters
+    #* above stay separate so the cutflow still reports them individually
+    df = df.Filter("(TAP & 4) != 0 "
+                   "&& ((Timing0_status | Timing1_status | Timing2_status | Timing3_status) & 4) == 0 "
+                   "&& distanceToCollidingBCID == 0", "Detector + trigger cuts")
 
     #* Definitions
+    #* Count with Sum(mask) rather than materialising a masked RVec just to read its size
     df = df.Define("NTracks", "Track_nLayers.size()")
-    df = df.Define("NPosTracks", "Track_nLayers[Track_charge > 0].size()")
-    df = df.Define("NNegTracks", "Track_nLayers[Track_charge < 0].size()")
-    df = df.Define("Track_nHits", "Track_nDoF + 5")        
-    df = df.Define("Track_chi2_per_dof", "Track_Chi2/Track_nDoF")
-    df = df.Define("GoodTracks", "Track_nLayers >= 7 && Track_chi2_per_dof < 25 && Track_nHits >= 12 && Track_pz0 > 20000 && RemoveDuplicates(Track_p0)" )
-    df = df.Define("NGoodTracks", "Track_nLayers[GoodTracks].size()")
-    df = df.Define("NGoodPosTracks", "Track_nLayers[GoodTracks && Track_charge > 0].size()")
-    df = df.Define("NGoodNegTracks", "Track_nLayers[GoodTracks && Track_charge < 0].size()")    
+    df = df.Define("NPosTracks", "Sum(Track_charge > 0)")
+    df = df.Define("NNegTracks", "Sum(Track_charge < 0)")
+    df = df.Define("Track_nHits", "Track_nDoF + 5")
+    df = df.Define("Track_chi2_per_dof", "Track_Chi2/Track_nDoF")   # still needed for its histogram
+    #* Single-pass C++ selection with the cheap integer cuts first - see GoodTrackMask in RDFDefines.h
+    df = df.Define("GoodTracks", "GoodTrackMask(Track_nLayers, Track_nDoF, Track_Chi2, Track_pz0, Track_p0)")
+    df = df.Define("NGoodTracks", "Sum(GoodTracks)")
+    df = df.Define("NGoodPosTracks", "Sum(GoodTracks && Track_charge > 0)")
+    df = df.Define("NGoodNegTracks", "Sum(GoodTracks && Track_charge < 0)")
     df = df.Define("Track_pz_charge0", "Track_pz0 * Track_charge")
-    df = df.Define("Track_theta_x1", "asin(Track_px1/Track_p1)")
-    df = df.Define("Track_theta_y1", "asin(Track_py1/Track_p1)")
-    df = df.Define("Track_pt0", "sqrt(Track_px0*Track_px0 + Track_py0*Track_py0)")
-    df = df.Define("Track_theta0", "asin(Track_pt0/Track_p0)")
-    df = df.Define("Track_phi0", "acos(Track_px0/Track_pt0)")
-    df = df.Define("Track_eta0", "-log(tan(Track_theta0/2))")
-    df = df.Define("Track_theta_x0", "asin(Track_px0/Track_p0)")
-    df = df.Define("Track_theta_y0", "asin(Track_py0/Track_p0)")
-    df = df.Define("Track_theta_x0_pos", "Track_theta_x0[Track_charge > 0]")
-    df = df.Define("Track_theta_x0_neg", "Track_theta_x0[Track_charge < 0]")
-    df = df.Define("Track_theta_y0_pos", "Track_theta_y0[Track_charge > 0]")
-    df = df.Define("Track_theta_y0_neg", "Track_theta_y0[Track_charge < 0]")
-    df = df.Define("Track_x0_pos", "Track_x0[Track_charge > 0]")
-    df = df.Define("Track_x0_neg", "Track_x0[Track_charge < 0]")
-    df = df.Define("Track_y0_pos", "Track_y0[Track_charge > 0]")
-    df = df.Define("Track_y0_neg", "Track_y0[Track_charge < 0]")
+
+    #* All of the derived kinematics come from one single-pass C++ kernel (see RDFDefines.h)
+    #* The columns below are just cheap member accesses into the struct it returns
+    df = df.Define("trkKin", "ComputeTrackKin(Track_px0, Track_py0, Track_p0, Track_px1, Track_py1, Track_p1)")
+    df = df.Define("Track_pt0", "trkKin.pt0")
+    df = df.Define("Track_theta0", "trkKin.theta0")
+    df = df.Define("Track_phi0", "trkKin.phi0")
+    df = df.Define("Track_eta0", "trkKin.eta0")
+    df = df.Define("Track_theta_x0", "trkKin.theta_x0")
+    df = df.Define("Track_theta_y0", "trkKin.theta_y0")
+    df = df.Define("Track_theta_x1", "trkKin.theta_x1")
+    df = df.Define("Track_theta_y1", "trkKin.theta_y1")
+    #* Likewise the charge-split columns come from one pass over the tracks rather than
+    #* a masked RVec subscript (and temporary mask) per column
+    df = df.Define("trkSplit", "SplitByCharge(Track_charge, Track_theta_x0, Track_theta_y0, Track_x0, Track_y0)")
+    df = df.Define("Track_theta_x0_pos", "trkSplit.theta_x0_pos")
+    df = df.Define("Track_theta_x0_neg", "trkSplit.theta_x0_neg")
+    df = df.Define("Track_theta_y0_pos", "trkSplit.theta_y0_pos")
+    df = df.Define("Track_theta_y0_neg", "trkSplit.theta_y0_neg")
+    df = df.Define("Track_x0_pos", "trkSplit.x0_pos")
+    df = df.Define("Track_x0_neg", "trkSplit.x0_neg")
+    df = df.Define("Track_y0_pos", "trkSplit.y0_pos")
+    df = df.Define("Track_y0_neg", "trkSplit.y0_neg")
 
     df = df.Define("Timing_charge_bottom", "Timing0_raw_charge + Timing1_raw_charge")
     df = df.Define("Timing_charge_top", "Timing2_raw_charge + Timing3_raw_charge")
     df = df.Define("Timing_charge_total", "Timing_charge_top + Timing_charge_bottom")
     
-    df = df.Define("hitsVetoNu0", "VetoNu0_raw_charge > 40")
-    df = df.Define("hitsVetoNu1", "VetoNu1_raw_charge > 40")
-    
-    df = df.Define("hitsVeto10", "Veto10_raw_charge > 40")
-    df = df.Define("hitsVeto11", "Veto11_raw_charge > 40")
-    df = df.Define("hitsVeto20", "Veto20_raw_charge > 40")
-    df = df.Define("hitsVeto21", "Veto21_raw_charge > 40")
-
-    df = df.Define(f"hitsTiming", "((Track_Y_atTrig[0] > 20 && Timing_charge_top > 20) || \
-                                           (Track_Y_atTrig[0] < -20 && Timing_charge_bottom > 20) || \
-                                           (Track_Y_atTrig[0] > -20 && Track_Y_atTrig[0] < 20 && Timing_charge_total > 20))")
+    #* Pack the per-channel veto/preshower/calo hit flags into one bitmask filled by a single
+    #* C++ call per event (see RDFDefines.h for the bit layout and the calo thresholds)
+    #* The hits* columns keep their names for the histogram configs but are now just bit tests
+    df = df.Define("hitsMask", "ComputeHitsMask(VetoNu0_raw_charge, VetoNu1_raw_charge, "
+                               "Veto10_raw_charge, Veto11_raw_charge, Veto20_raw_charge, Veto21_raw_charge, "
+                               "Preshower0_raw_charge, Preshower1_raw_charge, "
+                               "CaloLo0_status, CaloLo1_status, CaloLo2_status, CaloLo3_status, "
+                               "CaloHi0_status, CaloHi1_status, CaloHi2_status, CaloHi3_status, "
+                               "CaloLo0_raw_charge, CaloLo1_raw_charge, CaloLo2_raw_charge, CaloLo3_raw_charge, "
+                               "CaloHi0_raw_charge, CaloHi1_raw_charge, CaloHi2_raw_charge, CaloHi3_raw_charge)")
+
+    df = df.Define("hitsVetoNu0", "(hitsMask >> 0) & 1u")
+    df = df.Define("hitsVetoNu1", "(hitsMask >> 1) & 1u")
+
+    df = df.Define("hitsVeto10", "(hitsMask >> 2) & 1u")
+    df = df.Define("hitsVeto11", "(hitsMask >> 3) & 1u")
+    df = df.Define("hitsVeto20", "(hitsMask >> 4) & 1u")
+    df = df.Define("hitsVeto21", "(hitsMask >> 5) & 1u")
+
+    #* Single C++ helper rather than a three-arm OR chain - one Track_Y_atTrig[0] load per event
+    #* and safe for events with no tracks (the old expression indexed an empty RVec)
+    df = df.Define(f"hitsTiming", "HitsTiming(Track_Y_atTrig, Timing_charge_top, Timing_charge_bottom, Timing_charge_total)")
     
     df = df.Define("hitsTiming0", "Timing0_status == 0")
     df = df.Define("hitsTiming1", "Timing1_status == 0")
     df = df.Define("hitsTiming2", "Timing2_status == 0")
     df = df.Define("hitsTiming3", "Timing3_status == 0")
     
-    df = df.Define("hitsPreshower0", "Preshower0_raw_charge > 2.5")
-    df = df.Define("hitsPreshower1", "Preshower1_raw_charge > 2.5")
+    df = df.Define("hitsPreshower0", "(hitsMask >> 6) & 1u")
+    df = df.Define("hitsPreshower1", "(hitsMask >> 7) & 1u")
 
-    df = df.Define("hitsCaloLo0", "CaloLo0_status == 0")
-    df = df.Define("hitsCaloLo1", "CaloLo1_status == 0")
-    df = df.Define("hitsCaloLo2", "CaloLo2_status == 0")
-    df = df.Define("hitsCaloLo3", "CaloLo3_status == 0")
+    df = df.Define("hitsCaloLo0", "(hitsMask >> 8) & 1u")
+    df = df.Define("hitsCaloLo1", "(hitsMask >> 9) & 1u")
+    df = df.Define("hitsCaloLo2", "(hitsMask >> 10) & 1u")
+    df = df.Define("hitsCaloLo3", "(hitsMask >> 11) & 1u")
 
     # Brian says that the double peaks in the CaloHi channel are coming from muons hitting the PMTs rather than energy deposits
-    # He suggests requiring that the CaloLo signal is at least 10x  higher than the CaloHi signal
-    df = df.Define("hitsCaloHi0", "(CaloHi0_status == 0) && (CaloLo0_raw_charge > 10 * CaloHi0_raw_charge)")
-    df = df.Define("hitsCaloHi1", "(CaloHi1_status == 0) && (CaloLo1_raw_charge > 10 * CaloHi1_raw_charge)")
-    df = df.Define("hitsCaloHi2", "(CaloHi2_status == 0) && (CaloLo2_raw_charge > 10 * CaloHi2_raw_charge)")
-    df = df.Define("hitsCaloHi3", "(CaloHi3_status == 0) && (CaloLo3_raw_charge > 10 * CaloHi3_raw_charge)")
+    # He suggests requiring that the CaloLo signal is at least 10x higher than the CaloHi signal
+    # (this requirement lives in ComputeHitsMask)
+    df = df.Define("hitsCaloHi0", "(hitsMask >> 12) & 1u")
+    df = df.Define("hitsCaloHi1", "(hitsMask >> 13) & 1u")
+    df = df.Define("hitsCaloHi2", "(hitsMask >> 14) & 1u")
+    df = df.Define("hitsCaloHi3", "(hitsMask >> 15) & 1u")
+
+    #* Write the snapshot cache if asked. This costs an extra event loop up-front but the cuts
+    #* have already been applied, so subsequent runs read the slim file instead of the full NTuples
+    #* (TTree rather than RNTuple since the latter is still experimental in the LCG ROOT we use)
+    if snapshot_cache is not None:
+        logging.info(f"Writing pre-selected events to snapshot cache {snapshot_cache}")
+        #* The intermediate struct-valued columns have no ROOT dictionary so can't become branches -
+        #* skip them; their member columns are written instead
+        columns = ROOT.std.vector("string")()
+        for column in df.GetColumnNames():
+            if str(column) not in _STRUCT_COLUMNS: columns.push_back(column)
+        df.Snapshot("nt_slim", snapshot_cache, columns)
+        df = ROOT.RDataFrame("nt_slim", snapshot_cache)
+
+    return df, _book_calo_counts(df)
+
+
+def _book_calo_counts(df: ROOT.RDataFrame) -> Dict:
+    """
+    Book the lazy calorimeter yield counts so that they are computed in the same event loop as the histograms
+    args:
+        `df`: `ROOT.RDataFrame` - the filtered dataframe
+    returns:
+        `calo_counts`: `Dict` - maps yield histogram name to its lazy count
+    """
 
-    #Calorimeter Yields Variables
     GeV = 1000
-    CaloHiCount = df.Filter(f"CaloHi_total_E_EM > {100*GeV}").Count()
-    CaloLoCount = df.Filter(f"CaloLo_total_E_EM > {10*GeV} && CaloLo_total_E_EM < {100*GeV}").Count()
+    return {
+        "CaloHiYield": df.Filter(f"CaloHi_total_E_EM > {100*GeV}").Count(),
+        "CaloLoYield": df.Filter(f"CaloLo_total_E_EM > {10*GeV} && CaloLo_total_E_EM < {100*GeV}").Count(),
+    }
 
-    CaloHiYield = CaloHiCount.GetValue()
-    CaloLoYield = CaloLoCount.GetValue()
 
-    df = df.Define("CaloHiYield", f"{CaloHiYield}").Define("CaloLoYield", f"{CaloLoYield}")
-    return df
+#* Run number in NTuple filenames, e.g. Faser-Physics-014587-00000-00006-r0022-PHYS.root
+_RUN_NUMBER_RE = re.compile(r"-(\d{6})-")
 
 
-def parse_input_filelists(input_file_list_dir: str) -> Dict:
+def parse_input_filelists(input_file_list_dir: str, run_number: int=None) -> Dict:
     """
     This function parses as directory containing a list of plain .txt files
     The format of the files must have one file path per line
@@ -556,33 +828,39 @@ def parse_input_filelists(input_file_list_dir: str) -> Dict:
 
     args:
         `input_file_list_dir`: `str` - Path to directory containing `.txt` files, listing filepaths to NTuple files
-    
+        `run_number`: `int`(optional) - if given, only entries for this run are parsed and kept.
+        We run one run per job, so this skips the parsing (and memory) for every other run
+
     returns:
         `file_dict`: `Dict` - A dictionary which maps the run number to a list of NTuple files for that run
 
     """
 
-    txt_files = glob.glob(f"{input_file_list_dir}/*.txt")
+    file_dict = defaultdict(list)
+
+    #* Cheap substring pre-filter for the requested run - avoids the basename/regex work
+    #* on the lines for every other run
+    run_tag = f"-{run_number:06d}-" if run_number is not None else None
 
-    file_dict = {}
+    #* scandir reads the directory in one pass with no extra stat() per entry (glob stats
+    #* every match). With a handful of filelists the parsing itself isn't worth parallelising
+    txt_files = [entry.path for entry in os.scandir(input_file_list_dir)
+                 if entry.is_file() and entry.name.endswith(".txt")]
 
     for fpath in txt_files:
-        with open(fpath, 'r') as f:
-            for line in f:
-                if line.startswith("#"): continue
-
-                the_file_path = line.strip().strip("\n")
-                the_file_name = os.path.basename(the_file_path)
-                the_run_number = the_file_name.split("-")[2]
-                try:
-                    the_run_number = int(the_run_number)
-                except ValueError as e:
-                    print(f"")
-
-                if the_run_number in file_dict.keys():
-                    file_dict[the_run_number].append(the_file_path)
-                else:
-                    file_dict[the_run_number] = [the_file_path]    
+        #* Read the whole file in one go - the per-line buffered reads add up for long filelists
+        for line in Path(fpath).read_text().splitlines():
+            if line.startswith("#"): continue
+            if run_tag is not None and run_tag not in line: continue
+
+            the_file_path = line.strip()
+            match = _RUN_NUMBER_RE.search(os.path.basename(the_file_path))
+            if not match:
+                logging.warning(f"Could not parse a run number from {the_file_path} - skipping")
+                continue
+
+            file_dict[int(match.group(1))].append(the_file_path)
+
     return file_dict
 
 
@@ -603,7 +881,7 @@ def parse_histogram_configs(histogram_cfg_dir: str) -> Dict:
 
     for fpath in cfg_fpaths:
         with open(fpath, 'r') as f:
-            this_cfg_dict = yaml.safe_load(f)
+            this_cfg_dict = yaml.load(f, Loader=_YamlLoader)
 
             if not this_cfg_dict.get('histograms', False):
                 logging.error(f"The config file {fpath} does not contain the key `histograms`. Please check the format of your config file.")
@@ -616,19 +894,59 @@ def parse_histogram_configs(histogram_cfg_dir: str) -> Dict:
                     logging.error(f"Histogram {key} in {fpath} is missing required keys. Missing keys: {required_keys - cfg_dict.keys()}. Check your config file.")
                     raise ValueError("Invalid Histogram config")
             
+            #* Flag configs that clobber one defined in an earlier file - almost certainly a copy-paste mistake
+            duplicate_keys = config_dict.keys() & this_cfg_dict['histograms'].keys()
+            if duplicate_keys:
+                logging.warning(f"Histogram config(s) {sorted(duplicate_keys)} in {fpath} override earlier definitions")
+
             config_dict = config_dict | this_cfg_dict['histograms']
 
 
     return config_dict
 
 
+def _move_output(src: str, dst_dir: str) -> str:
+    """
+    Move the output file into the output directory
+    A plain rename when source and destination share a filesystem (zero-copy); otherwise the bytes
+    are streamed with os.sendfile, a single in-kernel copy rather than shutil's userspace buffer loop
+    (condor scratch -> shared filesystem is the usual cross-device case)
+
+    args:
+        `src`: `str` - path to the file to move
+        `dst_dir`: `str` - directory to move it into (must exist)
+
+    returns:
+        `dst`: `str` - the destination path
+    """
+
+    dst = os.path.join(dst_dir, os.path.basename(src))
+
+    if os.stat(src).st_dev == os.stat(dst_dir).st_dev:
+        os.rename(src, dst)
+    else:
+        size = os.path.getsize(src)
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            #* sendfile may copy fewer bytes than asked (a single call is capped at ~2GiB on
+            #* linux), so keep going from the returned offset until the whole file is across
+            offset = 0
+            while offset < size:
+                offset += os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+        os.unlink(src)
+
+    return dst
+
+
 def main(args: argparse.Namespace) -> None:
 
-    #* Enable multithreading
-    ROOT.ROOT.EnableImplicitMT()
+    #* Enable multithreading (0 = let ROOT use all available cores)
+    ROOT.ROOT.EnableImplicitMT(args.nthreads)
+
+    #* Don't register histograms with the current directory - avoids thread-unsafe global state under IMT
+    ROOT.TH1.AddDirectory(False)
 
     #* Parse input files
-    all_files_dict = parse_input_filelists(args.input_file_list_dir)
+    all_files_dict = parse_input_filelists(args.input_file_list_dir, args.run)
     file_list = all_files_dict[args.run]
 
     if len(file_list) <= 0:
@@ -649,49 +967,56 @@ def main(args: argparse.Namespace) -> None:
     logging.info(f"Run {args.run} luminosity = {run_lumi:.3f} /fb")
 
     #* Construct dataframe
-    df = build_dataframe(file_list)
+    df, calo_counts = build_dataframe(file_list, args.run, args.grl_path, snapshot_cache=args.snapshot_cache)
     yield_hists = book_yield_hists(df, args.run)
-    run_hists = book_per_run_hists(df, histogram_config, args.run)
+    #* No run_number here - build_dataframe already filtered to the job's run
+    run_hists = book_per_run_hists(df, histogram_config, time_range=get_run_time_range(args.grl_path, args.run))
+
+    #* Book the cutflow report up-front so it fills in the same event loop as the histograms
+    #* rather than triggering a second one when we print it at the end
+    cut_report = df.Report()
 
     #* Make output file (and output directory if needs be)
+    #* contextlib.closing guarantees the TFile is closed even if something throws part-way through the writes
     output_file = f"{args.run}.root"
-    file = ROOT.TFile(output_file, "RECREATE")
-    tree = ROOT.TTree("dq", "Data Quality")
-    logging.info(f"Writing output to {output_file}")
-    
-    #* Write out run number and lumi for convenience
-    lumi_branch = ROOT.std.vector("float")()
-    lumi_branch.push_back(run_lumi)
-    tree.Branch("lumi", lumi_branch)
-
-    run_num_branch = ROOT.std.vector("int")()
-    run_num_branch.push_back(args.run)
-    tree.Branch("run_number", run_num_branch)
-
-
-    #* Write histograms
-    for h in tqdm(yield_hists, desc="Info: Filling yield hists: "):
-        h.Write()
-    for h in tqdm(run_hists, desc="Info: Filling run hists: "):
-        h.Write()
-
-    #* Close the file
-    tree.Fill()
-    tree.Write()
-    file.Close()
+    #* LZ4 writes/reads the small histogram payload noticeably faster than the default ZLIB
+    #* for essentially the same file size
+    with contextlib.closing(ROOT.TFile.Open(output_file, "RECREATE", "", ROOT.ROOT.CompressionSettings(ROOT.ROOT.kLZ4, 1))) as file:
+        logging.info(f"Writing output to {output_file}")
+
+        #* Write out run number and lumi for convenience. These are single scalars so they are
+        #* stored as TParameter keys rather than a one-entry TTree with vector branches
+        #* (readers do file['lumi'].member('fVal') / TFile::Get("lumi")->GetVal())
+        ROOT.TParameter["double"]("lumi", float(run_lumi)).Write()
+        ROOT.TParameter["int"]("run_number", int(args.run)).Write()
+
+        #* Fill everything in a single event loop rather than letting the first Write() below trigger it
+        ROOT.RDF.RunGraphs(yield_hists + run_hists + list(calo_counts.values()) + [cut_report])
+
+        #* Write histograms in one batch on the C++ side
+        logging.info(f"Writing {len(yield_hists) + len(run_hists)} histograms")
+        hists_to_write = ROOT.std.vector("TH1*")()
+        for h in yield_hists + run_hists:
+            hists_to_write.push_back(h.GetPtr())
+
+        calo_hists = make_calo_yield_hists(calo_counts, args.run)  # keep a reference until they are written
+        for h in calo_hists:
+            hists_to_write.push_back(h)
+
+        ROOT.WriteAll(file, hists_to_write)
+
     logging.info(f"Wrote output to {output_file}")
 
     #* Move output file to output directory
     os.makedirs(args.output_file_dir, exist_ok=True)
     os.makedirs(f"{args.output_file_dir}/logs", exist_ok=True) # just in case the log directory doesn't exist
     logging.info(f"transferring output file: {output_file} -> {args.output_file_dir}/{output_file}")
-    shutil.move(output_file, f"{args.output_file_dir}/{output_file}")
+    _move_output(output_file, args.output_file_dir)
     
 
     #* Print cutflow
     logging.info("Cutflow Report:")
-    cutReport = df.Report()
-    cutReport.Print()
+    cut_report.Print()
 
 
 if __name__ == "__main__":
@@ -701,8 +1026,10 @@ if __name__ == "__main__":
     parser.add_argument("--input_file_list_dir", "-i", help="directory to txt files containing the available NTuple paths", default=f"{os.getcwd()}/faser_filelists")
     parser.add_argument("--output_file_dir", "-o", type=str, default="output", help = "Output file directory")
     parser.add_argument("--histograms", "-c", type=str, default=f"{os.getcwd()}/histograms", help = "Directory containing the histogram config files")
+    parser.add_argument("--nthreads", "-j", type=int, default=0, help = "Number of threads for implicit multithreading (0 = all available cores)")
     parser.add_argument("-v", "--verbose",  help='If flag set then print debug messages', action='store_true')
     parser.add_argument("--grl_path", "-g", type=str, default="/cvmfs/faser.cern.ch/repo/sw/runlist/v8", help = "Path to directory containing GRL files in the .json format")
+    parser.add_argument("--snapshot_cache", "-s", type=str, default=None, help = "Optional path to a local snapshot of the pre-selected events. Written on the first run and read instead of the NTuples on subsequent runs")
     args = parser.parse_args()
 
     # Print our arguments
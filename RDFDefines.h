@@ -1,11 +1,50 @@
 #ifndef RDFDefines
 #define RDFDefines
 
+#include <algorithm>
+#include <cstdint>
+#include <numeric>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
 #include "ROOT/RDataFrame.hxx"
 #include "ROOT/RVec.hxx"
+#include "TDirectory.h"
+#include "TH1.h"
 
 using namespace ROOT::VecOps;
 
+// Per-run GRL time periods, sorted by start time. Filled from python at startup
+// (see declare_grl_time_filters in FASER_DQ_RDF.py)
+using TimePeriodMap = std::unordered_map<unsigned, std::vector<std::pair<ULong64_t, ULong64_t>>>;
+TimePeriodMap gGoodTimes;
+TimePeriodMap gExcludedTimes;
+
+// Binary search for the interval containing time t - O(log N) per event rather
+// than the O(N) scan of the old giant OR-chain cut string
+bool InTimePeriods(const TimePeriodMap& periods, unsigned run, ULong64_t t) {
+  auto it = periods.find(run);
+  if (it == periods.end()) return false;
+
+  const auto& intervals = it->second;
+  auto pos = std::upper_bound(intervals.begin(), intervals.end(), std::make_pair(t, ~0ULL));
+  if (pos == intervals.begin()) return false;
+  --pos;
+
+  return t >= pos->first && t <= pos->second;
+}
+
+bool InGoodTimes(unsigned run, ULong64_t t) { return InTimePeriods(gGoodTimes, run, t); }
+bool InExcludedTimes(unsigned run, ULong64_t t) { return InTimePeriods(gExcludedTimes, run, t); }
+
+// Write a batch of histograms in one C++-side loop rather than paying a
+// python->C++ crossing per histogram
+void WriteAll(TDirectory* dir, const std::vector<TH1*>& hists) {
+  dir->cd();
+  for (auto* h : hists) h->Write();
+}
+
 template<typename T>
 RVec<T> DeltaTheta(const RVec<T>& theta1, const RVec<T>& theta2) {
   return DeltaPhi(theta1, theta2);
@@ -47,6 +86,100 @@ RVec<T> MaxFrom(RVec<T> v1, RVec<T> v2) {
   return v;
 }
 
+// Opening angle w.r.t. the beam axis from a momentum component and the total momentum
+template<typename T>
+RVec<T> Theta(const RVec<T>& component, const RVec<T>& p) {
+  return asin(component / p);
+}
+
+template<typename T>
+RVec<T> EtaFromTheta(const RVec<T>& theta) {
+  return -log(tan(theta / 2));
+}
+
+// All of the derived per-track kinematics in one struct, so they can be computed in a single
+// pass over the momentum columns instead of one RVec walk (and one jitted functor) per column
+template<typename T>
+struct TrackKin {
+  RVec<T> pt0, theta0, phi0, eta0, theta_x0, theta_y0, theta_x1, theta_y1;
+};
+
+template<typename T>
+TrackKin<T> ComputeTrackKin(const RVec<T>& px0, const RVec<T>& py0, const RVec<T>& p0,
+                            const RVec<T>& px1, const RVec<T>& py1, const RVec<T>& p1) {
+  const size_t n = px0.size();
+
+  TrackKin<T> out;
+  out.pt0.reserve(n);
+  out.theta0.reserve(n);
+  out.phi0.reserve(n);
+  out.eta0.reserve(n);
+  out.theta_x0.reserve(n);
+  out.theta_y0.reserve(n);
+  out.theta_x1.reserve(n);
+  out.theta_y1.reserve(n);
+
+  for (size_t i = 0; i < n; i++) {
+    const T pt = sqrt(px0[i] * px0[i] + py0[i] * py0[i]);
+    const T theta = asin(pt / p0[i]);
+
+    out.pt0.push_back(pt);
+    out.theta0.push_back(theta);
+    // atan2 keeps the sign of phi (acos folded everything into [0, pi]), can't hit a domain
+    // error from px/pt rounding above 1, and skips the divide
+    out.phi0.push_back(atan2(py0[i], px0[i]));
+    out.eta0.push_back(-log(tan(theta / 2)));
+    out.theta_x0.push_back(asin(px0[i] / p0[i]));
+    out.theta_y0.push_back(asin(py0[i] / p0[i]));
+    out.theta_x1.push_back(asin(px1[i] / p1[i]));
+    out.theta_y1.push_back(asin(py1[i] / p1[i]));
+  }
+
+  return out;
+}
+
+// The charge-split track columns, filled in a single pass over the tracks rather than one
+// masked RVec subscript (and temporary) per column
+template<typename T>
+struct ChargeSplit {
+  RVec<T> theta_x0_pos, theta_x0_neg, theta_y0_pos, theta_y0_neg, x0_pos, x0_neg, y0_pos, y0_neg;
+};
+
+template<typename T, typename C>
+ChargeSplit<T> SplitByCharge(const RVec<C>& charge,
+                             const RVec<T>& theta_x0, const RVec<T>& theta_y0,
+                             const RVec<T>& x0, const RVec<T>& y0) {
+  const size_t n = charge.size();
+
+  ChargeSplit<T> out;
+
+  // Overallocates a little but avoids the repeated grow/memcpy of untipped RVecs
+  out.theta_x0_pos.reserve(n);
+  out.theta_x0_neg.reserve(n);
+  out.theta_y0_pos.reserve(n);
+  out.theta_y0_neg.reserve(n);
+  out.x0_pos.reserve(n);
+  out.x0_neg.reserve(n);
+  out.y0_pos.reserve(n);
+  out.y0_neg.reserve(n);
+
+  for (size_t i = 0; i < n; i++) {
+    if (charge[i] > 0) {
+      out.theta_x0_pos.push_back(theta_x0[i]);
+      out.theta_y0_pos.push_back(theta_y0[i]);
+      out.x0_pos.push_back(x0[i]);
+      out.y0_pos.push_back(y0[i]);
+    } else if (charge[i] < 0) {
+      out.theta_x0_neg.push_back(theta_x0[i]);
+      out.theta_y0_neg.push_back(theta_y0[i]);
+      out.x0_neg.push_back(x0[i]);
+      out.y0_neg.push_back(y0[i]);
+    }
+  }
+
+  return out;
+}
+
 double Radius(double x, double y) {
   return sqrt(x * x + y * y);
 }
@@ -68,20 +201,102 @@ RVec<T> Phi(RVec<T> px, RVec<T> py) {
 }
 
 
+// Timing-station hit decision: compare the top/bottom/total charge depending on where the
+// leading track crossed the trigger plane. One ternary chain with a single [0] load, and a
+// guard for events with no tracks (the old RVec expression would read out of bounds there)
+template<typename T>
+inline bool HitsTiming(const RVec<T>& yAtTrig, double chargeTop, double chargeBottom, double chargeTotal) {
+  if (yAtTrig.empty()) return false;
+
+  const T y0 = yAtTrig[0];
+  return y0 > 20 ? chargeTop > 20 : y0 < -20 ? chargeBottom > 20 : chargeTotal > 20;
+}
+
+// All of the per-channel hit flags packed into one bitmask computed in a single call per event
+// rather than 16 separate jitted Define functors. Bit layout (LSB first):
+//   0-1  VetoNu0/1      2-5  Veto10/11/20/21     6-7  Preshower0/1
+//   8-11 CaloLo0-3      12-15 CaloHi0-3
+// The hits* columns in FASER_DQ_RDF.py are thin bit tests on this mask
+inline uint32_t ComputeHitsMask(double vetoNu0, double vetoNu1,
+                                double veto10, double veto11, double veto20, double veto21,
+                                double preshower0, double preshower1,
+                                int caloLo0Status, int caloLo1Status, int caloLo2Status, int caloLo3Status,
+                                int caloHi0Status, int caloHi1Status, int caloHi2Status, int caloHi3Status,
+                                double caloLo0, double caloLo1, double caloLo2, double caloLo3,
+                                double caloHi0, double caloHi1, double caloHi2, double caloHi3) {
+  uint32_t m = 0;
+
+  m |= uint32_t(vetoNu0 > 40) << 0;
+  m |= uint32_t(vetoNu1 > 40) << 1;
+
+  m |= uint32_t(veto10 > 40) << 2;
+  m |= uint32_t(veto11 > 40) << 3;
+  m |= uint32_t(veto20 > 40) << 4;
+  m |= uint32_t(veto21 > 40) << 5;
+
+  m |= uint32_t(preshower0 > 2.5) << 6;
+  m |= uint32_t(preshower1 > 2.5) << 7;
+
+  m |= uint32_t(caloLo0Status == 0) << 8;
+  m |= uint32_t(caloLo1Status == 0) << 9;
+  m |= uint32_t(caloLo2Status == 0) << 10;
+  m |= uint32_t(caloLo3Status == 0) << 11;
+
+  // Require CaloLo >> CaloHi to reject the double peaks from muons hitting the PMTs
+  m |= uint32_t(caloHi0Status == 0 && caloLo0 > 10 * caloHi0) << 12;
+  m |= uint32_t(caloHi1Status == 0 && caloLo1 > 10 * caloHi1) << 13;
+  m |= uint32_t(caloHi2Status == 0 && caloLo2 > 10 * caloHi2) << 14;
+  m |= uint32_t(caloHi3Status == 0 && caloLo3 > 10 * caloHi3) << 15;
+
+  return m;
+}
+
 template<typename T>
 RVec<bool> RemoveDuplicates(RVec<T> vec, float eps = 1e-15) {
-  
-  
-  RVec<bool> res(vec.size(), true);
-
-  for (int i(0); i < vec.size(); i++) {
-    for (int j(0); j < i; j++) { 
-      if (abs(vec[i] - vec[j]) < eps) 
-	res[i] = false;
-    }
+
+  const size_t n = vec.size();
+  RVec<bool> res(n, true);
+  if (n <= 1) return res;
+
+  // Index sort + adjacent-diff scan - O(N log N) rather than the old all-pairs O(N^2) loop.
+  // Ties sort by original index so the first occurrence is the one kept, as before
+  std::vector<size_t> idx(n);
+  std::iota(idx.begin(), idx.end(), 0);
+  std::sort(idx.begin(), idx.end(), [&](size_t a, size_t b) {
+    return vec[a] < vec[b] || (vec[a] == vec[b] && a < b);
+  });
+
+  for (size_t k = 1; k < n; k++) {
+    if (std::abs(vec[idx[k]] - vec[idx[k - 1]]) < eps)
+      res[idx[k]] = false;
   }
 
   return res;
 }
 
+// Good-track selection in one pass, with the cheap integer cuts gating the rest so most tracks
+// bail out before any floating-point work. The chi2/nDoF cut is evaluated as chi2 < 25*nDoF to
+// avoid the per-track division (and behaves the same for nDoF == 0, where the old division
+// produced inf and failed the cut). Duplicate rejection keeps the first occurrence, as before
+template<typename TL, typename TD, typename TC, typename TP>
+RVec<int> GoodTrackMask(const RVec<TL>& nLayers, const RVec<TD>& nDoF, const RVec<TC>& chi2,
+                        const RVec<TP>& pz0, const RVec<TP>& p0) {
+  const size_t n = nLayers.size();
+
+  RVec<int> good(n, 0);
+  const auto keep = RemoveDuplicates(p0);
+
+  for (size_t i = 0; i < n; i++) {
+    if (nLayers[i] < 7) continue;
+    if (nDoF[i] + 5 < 12) continue;        // nHits >= 12
+    if (pz0[i] <= 20000) continue;
+    if (!(chi2[i] < 25 * nDoF[i])) continue;
+    if (!keep[i]) continue;
+
+    good[i] = 1;
+  }
+
+  return good;
+}
+
 #endif
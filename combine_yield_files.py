@@ -0,0 +1,131 @@
+"""
+FASER Data Quality Yield Combiner
+_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-_-
+
+Combines the per-run output files made by FASER_DQ_RDF.py into a single file of
+run-binned yield histograms (one bin per run number) for the plotting notebooks
+
+Each per-run file holds single-bin yield histograms covering [run, run + 1), so
+combining is just a matter of dropping each file's bin content into the right
+slot of a wide run-number axis
+"""
+
+import os
+import glob
+import argparse
+import logging
+
+import uproot
+import numpy as np
+
+
+#* The yield histograms written by FASER_DQ_RDF.py - all binned by run number
+YIELD_NAMES = [
+    "Yield",
+    "TrkYield",
+    "PosTrkYield",
+    "NegTrkYield",
+    "GoodTrkYield",
+    "GoodPosTrkYield",
+    "GoodNegTrkYield",
+    "CaloHiYield",
+    "CaloLoYield",
+]
+
+
+def make_run_axis(hists_per_name: dict) -> np.ndarray:
+    """
+    Build the common integer run-number axis spanning every histogram in every input file
+    All yield histograms are binned by run number, so one axis serves them all - computing it
+    once here avoids re-concatenating the edges for each of the histogram names
+
+    args:
+        `hists_per_name`: `dict` - maps histogram name to a list of (values, edges) numpy pairs
+
+    returns:
+        `new_edges`: `np.ndarray` - the combined bin edges
+    """
+
+    lower = min(edges[0] for npy_hists in hists_per_name.values() for _, edges in npy_hists)
+    upper = max(edges[-1] for npy_hists in hists_per_name.values() for _, edges in npy_hists)
+
+    #* Yield histograms have unit-width integer bins, so the union axis is just every run number in range
+    return np.linspace(lower, upper, int(upper - lower + 1))
+
+
+def combine_histograms(npy_hists: list, new_edges: np.ndarray) -> tuple:
+    """
+    Merge a list of run-binned histograms onto the common run-number axis
+    The bin contents are placed with a searchsorted + slice assignment rather than a
+    per-bin python copy loop
+
+    args:
+        `npy_hists`: `list` - list of (values, edges) numpy histogram pairs (as from uproot's to_numpy)
+        `new_edges`: `np.ndarray` - the combined bin edges (from `make_run_axis`)
+
+    returns:
+        `(new_values, new_edges)`: `tuple` - the combined histogram as numpy arrays
+    """
+
+    new_values = np.zeros(len(new_edges) - 1, dtype=npy_hists[0][0].dtype)
+    for values, edges in npy_hists:
+        start_idx = int(np.searchsorted(new_edges, edges[0]))
+        new_values[start_idx:start_idx + values.size] += values
+
+    return new_values, new_edges
+
+
+def main(args: argparse.Namespace) -> None:
+
+    fpaths = sorted(glob.glob(f"{args.input_dir}/*.root"))
+
+    if len(fpaths) == 0:
+        print(f"Error: Found no .root files in {args.input_dir}")
+        return 1
+
+    logging.info(f"Combining yields from {len(fpaths)} files")
+
+    hists_per_name = {name: [] for name in YIELD_NAMES}
+
+    for fpath in fpaths:
+        with uproot.open(fpath, minimal_ttree_metadata=True, object_cache=None, array_cache=None) as f:
+            for name in YIELD_NAMES:
+                if name not in f:
+                    logging.warning(f"{fpath} does not contain histogram {name} - skipping")
+                    continue
+                hists_per_name[name].append(f[name].to_numpy())
+
+    if all(len(npy_hists) == 0 for npy_hists in hists_per_name.values()):
+        print(f"Error: Found no yield histograms in {args.input_dir}")
+        return 1
+
+    #* One shared run-number axis for every histogram name
+    new_edges = make_run_axis(hists_per_name)
+
+    with uproot.recreate(args.output_file) as fout:
+        for name, npy_hists in hists_per_name.items():
+            if len(npy_hists) == 0:
+                logging.warning(f"No input histograms found for {name} - nothing to write")
+                continue
+            fout[name] = combine_histograms(npy_hists, new_edges)
+
+    logging.info(f"Wrote combined yields to {args.output_file}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_dir", type=str, help="Directory containing the per-run output files from FASER_DQ_RDF.py")
+    parser.add_argument("--output_file", "-o", type=str, default="yields_combined.root", help="Path to the combined output file")
+    parser.add_argument("-v", "--verbose", help='If flag set then print debug messages', action='store_true')
+    args = parser.parse_args()
+
+    # Print our arguments
+    for key in vars(args):
+        print(f"\t {key:<30}: {getattr(args, key)}")
+
+    # Set log level
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    main(args)